@@ -0,0 +1,31 @@
+"""JSON loading through ``orjson`` when installed, the standard ``json`` otherwise."""
+
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+from typing import Any
+
+try:  # pragma: no cover - depends on the environment
+    import orjson
+
+    def _loads(data: bytes) -> Any:
+        return orjson.loads(data)
+
+except ImportError:  # pragma: no cover - depends on the environment
+    import json
+
+    def _loads(data: bytes) -> Any:
+        return json.loads(data.decode("utf-8"))
+
+
+def load_json(path: Path) -> Any:
+    """Read and decode the JSON document stored at ``path``."""
+
+    return _loads(path.read_bytes())
+
+
+def intern_id(value: Any) -> Any:
+    """Intern string ids read from JSON; other values are returned unchanged."""
+
+    return sys.intern(value) if isinstance(value, str) else value
@@ -1,192 +1,227 @@
 from __future__ import annotations
 from dataclasses import dataclass
-from datetime import datetime, time, timedelta
-from typing import Callable, Dict, Iterable, List, Sequence, Tuple, TypeVar
+from datetime import datetime
+from functools import lru_cache
+from typing import Dict, List, Mapping, NamedTuple, Sequence, Tuple, TypeVar
 
-from .models import DaySummary, MachineUsage, Plant, SimulationResult
+import numpy as np
+
+from .models import DaySummary, SimulationResult
 
 RESOURCE_CATEGORY = "resource_balance"
 MACHINE_CAPACITY_CATEGORY = "machine_capacity"
 PRODUCT_CATEGORY = "product_output"
 
 
-@dataclass(frozen=True)
-class HourlyPoint:
+class HourlyPoint(NamedTuple):
     """One value for a specific timestamp."""
 
     timestamp: datetime
     value: float
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, eq=False, slots=True)
 class HourlySeries:
-    """Represents a time series expanded to hourly values."""
+    """Represents a time series expanded to hourly values, stored as parallel arrays."""
 
     id: str
     label: str
     category: str
     unit: str | None
-    points: Sequence[HourlyPoint]
+    timestamps: np.ndarray
+    values: np.ndarray
+
+    @property
+    def points(self) -> Tuple[HourlyPoint, ...]:
+        return tuple(
+            HourlyPoint(timestamp=timestamp, value=value)
+            for timestamp, value in zip(self.timestamps.tolist(), self.values.tolist())
+        )
 
     def total(self) -> float:
-        return sum(point.value for point in self.points)
+        return float(self.values.sum())
+
 
+@lru_cache(maxsize=None)
+def _hour_offsets(slots_per_day: int) -> np.ndarray:
+    """Read-only ``timedelta64[h]`` offsets of the slots within a day."""
 
-def _hourly_points(day: DaySummary, total: float, slots_per_day: int) -> List[HourlyPoint]:
     if slots_per_day <= 0:
         raise ValueError("slots_per_day must be positive")
-    base = datetime.combine(day.date, time.min)
-    portion = total / slots_per_day
-    return [
-        HourlyPoint(timestamp=base + timedelta(hours=hour), value=portion)
-        for hour in range(slots_per_day)
-    ]
+    offsets = np.arange(slots_per_day, dtype="timedelta64[h]")
+    offsets.setflags(write=False)
+    return offsets
+
+
+def _hourly_timestamps(days: Sequence[DaySummary], slots_per_day: int) -> np.ndarray:
+    offsets = _hour_offsets(slots_per_day)
+    bases = np.array([day.date for day in days], dtype="datetime64[D]").astype("datetime64[h]")
+    timestamps = (bases[:, np.newaxis] + offsets).ravel()
+    timestamps.setflags(write=False)
+    return timestamps
 
 
 _KeyT = TypeVar("_KeyT")
 
 
+def _daily_matrix(ids: Sequence[_KeyT], rows: Sequence[Mapping[_KeyT, float]]) -> np.ndarray:
+    """Scatter the per-day mappings into a dense (days x ids) matrix."""
+
+    id_to_col = {item_id: column for column, item_id in enumerate(ids)}
+    row_ids: List[int] = []
+    key_ids: List[int] = []
+    values: List[float] = []
+    for row_ix, row in enumerate(rows):
+        for item_id, value in row.items():
+            column = id_to_col.get(item_id)
+            if column is not None:
+                row_ids.append(row_ix)
+                key_ids.append(column)
+                values.append(value)
+
+    matrix = np.zeros((len(rows), len(ids)), dtype=np.float64)
+    matrix[row_ids, key_ids] = values
+    return matrix
+
+
 def _expand_daily_values(
-    plant: Plant,
     days: Sequence[DaySummary],
-    ids: Iterable[_KeyT],
-    id_getter: Callable[[_KeyT], str],
-    extractor: Callable[[DaySummary, _KeyT], float],
-    label_getter: Callable[[Plant, _KeyT], str],
-    unit_getter: Callable[[Plant, _KeyT], str | None],
-    category: str,
+    ids: Sequence[_KeyT],
+    rows: Sequence[Mapping[_KeyT, float]],
     slots_per_day: int,
-) -> List[HourlySeries]:
+) -> Tuple[np.ndarray, List[Tuple[_KeyT, np.ndarray]]]:
+    """Spread the per-day values (one mapping per sorted day) over hourly slots."""
+
+    timestamps = _hourly_timestamps(days, slots_per_day)
+    matrix = _daily_matrix(ids, rows)
+    has_data = np.any(np.abs(matrix) > 1e-9, axis=0)
+    kept_ids = [item_id for item_id, keep in zip(ids, has_data.tolist()) if keep]
+    # One row per kept id so every series owns a contiguous slice of the buffer.
+    hourly = np.repeat(matrix[:, has_data].T / slots_per_day, slots_per_day, axis=1)
+    hourly.setflags(write=False)
+    return timestamps, list(zip(kept_ids, hourly))
+
+
+def _sorted_days(result: SimulationResult) -> List[DaySummary]:
+    return sorted(result.days, key=lambda day: day.date)
+
+
+def hourly_resource_series(result: SimulationResult, slots_per_day: int = 24) -> List[HourlySeries]:
+    return _resource_series(result, _sorted_days(result), slots_per_day)
+
+
+def _resource_series(result: SimulationResult, days: Sequence[DaySummary], slots_per_day: int) -> List[HourlySeries]:
+    resources = result.plant.resources
+    rows = [day.resource_balance for day in days]
+    resource_ids = set(resources)
+    for row in rows:
+        resource_ids.update(row)
+
+    timestamps, columns = _expand_daily_values(days, sorted(resource_ids), rows, slots_per_day)
     series_list: List[HourlySeries] = []
-    sorted_days = sorted(days, key=lambda day: day.date)
-    for item_id in ids:
-        points: List[HourlyPoint] = []
-        has_data = False
-        for day in sorted_days:
-            value = extractor(day, item_id)
-            if not has_data and abs(value) > 1e-9:
-                has_data = True
-            points.extend(_hourly_points(day, value, slots_per_day))
-        if not has_data:
-            continue
+    for resource_id, values in columns:
+        resource = resources.get(resource_id)
         series_list.append(
             HourlySeries(
-                id=id_getter(item_id),
-                label=label_getter(plant, item_id),
-                category=category,
-                unit=unit_getter(plant, item_id),
-                points=tuple(points),
+                id=resource_id,
+                label=resource.name if resource else resource_id,
+                category=RESOURCE_CATEGORY,
+                unit=(resource.unit or None) if resource else None,
+                timestamps=timestamps,
+                values=values,
             )
         )
     return series_list
 
 
-def hourly_resource_series(result: SimulationResult, slots_per_day: int = 24) -> List[HourlySeries]:
-    plant = result.plant
-    resource_ids = set(plant.resources.keys())
-    for day in result.days:
-        resource_ids.update(day.resource_balance.keys())
-
-    def _extract(day: DaySummary, resource_id: str) -> float:
-        return day.resource_balance.get(resource_id, 0.0)
-
-    def _label(_: Plant, resource_id: str) -> str:
-        resource = plant.resources.get(resource_id)
-        return resource.name if resource else resource_id
-
-    def _unit(_: Plant, resource_id: str) -> str | None:
-        resource = plant.resources.get(resource_id)
-        if not resource:
-            return None
-        return resource.unit or None
-
-    return _expand_daily_values(
-        plant,
-        result.days,
-        sorted(resource_ids),
-        lambda resource_id: resource_id,
-        _extract,
-        _label,
-        _unit,
-        RESOURCE_CATEGORY,
-        slots_per_day,
-    )
+def hourly_product_series(result: SimulationResult, slots_per_day: int = 24) -> List[HourlySeries]:
+    return _product_series(result, _sorted_days(result), slots_per_day)
 
 
-def hourly_product_series(result: SimulationResult, slots_per_day: int = 24) -> List[HourlySeries]:
-    plant = result.plant
-    product_ids = set(plant.products.keys())
-    for day in result.days:
-        product_ids.update(day.product_quantities.keys())
-
-    def _extract(day: DaySummary, product_id: str) -> float:
-        return day.product_quantities.get(product_id, 0.0)
-
-    def _label(_: Plant, product_id: str) -> str:
-        product = plant.products.get(product_id)
-        return product.name if product else product_id
-
-    def _unit(_: Plant, product_id: str) -> str | None:
-        product = plant.products.get(product_id)
-        if not product:
-            return None
-        return product.unit or None
-
-    return _expand_daily_values(
-        plant,
-        result.days,
-        sorted(product_ids),
-        lambda product_id: product_id,
-        _extract,
-        _label,
-        _unit,
-        PRODUCT_CATEGORY,
-        slots_per_day,
-    )
+def _product_series(result: SimulationResult, days: Sequence[DaySummary], slots_per_day: int) -> List[HourlySeries]:
+    products = result.plant.products
+    rows = [day.product_quantities for day in days]
+    product_ids = set(products)
+    for row in rows:
+        product_ids.update(row)
+
+    timestamps, columns = _expand_daily_values(days, sorted(product_ids), rows, slots_per_day)
+    series_list: List[HourlySeries] = []
+    for product_id, values in columns:
+        product = products.get(product_id)
+        series_list.append(
+            HourlySeries(
+                id=product_id,
+                label=product.name if product else product_id,
+                category=PRODUCT_CATEGORY,
+                unit=(product.unit or None) if product else None,
+                timestamps=timestamps,
+                values=values,
+            )
+        )
+    return series_list
 
 
 def hourly_machine_capacity_series(result: SimulationResult, slots_per_day: int = 24) -> List[HourlySeries]:
-    plant = result.plant
+    return _machine_capacity_series(result, _sorted_days(result), slots_per_day)
+
+
+def _machine_capacity_series(
+    result: SimulationResult, days: Sequence[DaySummary], slots_per_day: int
+) -> List[HourlySeries]:
+    machines = result.plant.machines
+    rows: List[Dict[Tuple[str, str], float]] = []
     machine_capacity_ids: Dict[Tuple[str, str], None] = {}
-    for day in result.days:
-        for machine_id, usage in day.machine_usage.items():
-            for capacity_key in usage.capacity_used.keys():
-                machine_capacity_ids[(machine_id, capacity_key)] = None
-
-    def _extract(day: DaySummary, key: Tuple[str, str]) -> float:
-        machine_id, capacity_key = key
-        usage: MachineUsage | None = day.machine_usage.get(machine_id)
-        if not usage:
-            return 0.0
-        return usage.capacity_used.get(capacity_key, 0.0)
-
-    def _label(_: Plant, key: Tuple[str, str]) -> str:
-        machine_id, capacity_key = key
-        machine = plant.machines.get(machine_id)
+    for day in days:
+        row = {
+            (machine_id, capacity_key): value
+            for machine_id, usage in day.machine_usage.items()
+            for capacity_key, value in usage.capacity_used.items()
+        }
+        machine_capacity_ids.update(dict.fromkeys(row))
+        rows.append(row)
+
+    timestamps, columns = _expand_daily_values(days, sorted(machine_capacity_ids), rows, slots_per_day)
+    series_list: List[HourlySeries] = []
+    for (machine_id, capacity_key), values in columns:
+        machine = machines.get(machine_id)
         machine_name = machine.name if machine else machine_id
-        return f"{machine_name} - {capacity_key}"
-
-    def _unit(_: Plant, key: Tuple[str, str]) -> str | None:
-        _machine_id, _capacity_key = key
-        return None
-
-    return _expand_daily_values(
-        plant,
-        result.days,
-        sorted(machine_capacity_ids.keys()),
-        lambda key: f"{key[0]}::{key[1]}",
-        _extract,
-        _label,
-        _unit,
-        MACHINE_CAPACITY_CATEGORY,
-        slots_per_day,
-    )
+        series_list.append(
+            HourlySeries(
+                id=f"{machine_id}::{capacity_key}",
+                label=f"{machine_name} - {capacity_key}",
+                category=MACHINE_CAPACITY_CATEGORY,
+                unit=None,
+                timestamps=timestamps,
+                values=values,
+            )
+        )
+    return series_list
 
 
 def build_hourly_series(result: SimulationResult, slots_per_day: int = 24) -> List[HourlySeries]:
+    days = _sorted_days(result)
     series: List[HourlySeries] = []
-    series.extend(hourly_resource_series(result, slots_per_day=slots_per_day))
-    series.extend(hourly_product_series(result, slots_per_day=slots_per_day))
-    series.extend(hourly_machine_capacity_series(result, slots_per_day=slots_per_day))
+    series.extend(_resource_series(result, days, slots_per_day))
+    series.extend(_product_series(result, days, slots_per_day))
+    series.extend(_machine_capacity_series(result, days, slots_per_day))
     return series
 
+
+def build_hourly_series_by_category(
+    result: SimulationResult, slots_per_day: int = 24
+) -> Dict[str, List[HourlySeries]]:
+    """Hourly series grouped by category, each group sorted by label."""
+
+    days = _sorted_days(result)
+    builders = (
+        (RESOURCE_CATEGORY, _resource_series),
+        (PRODUCT_CATEGORY, _product_series),
+        (MACHINE_CAPACITY_CATEGORY, _machine_capacity_series),
+    )
+    grouped: Dict[str, List[HourlySeries]] = {}
+    for category, builder in builders:
+        series_list = builder(result, days, slots_per_day)
+        if series_list:
+            grouped[category] = sorted(series_list, key=lambda item: item.label)
+    return grouped
@@ -1,25 +1,31 @@
 from __future__ import annotations
 
-import json
 from pathlib import Path
 from typing import Dict, Iterable
 
+from ._json import intern_id, load_json
 from .models import Machine, MachineGroup, Plant, Product, RecipeStep, Resource
 
+_STEP_TARGETS = frozenset({"group", "machine", "order_machine"})
+
+
+def _float_map(values: Dict) -> Dict[str, float]:
+    return {intern_id(key): float(value) for key, value in values.items()}
+
 
 def _load_resources(config: Dict) -> Dict[str, Resource]:
     resources = {}
     for item in config.get("resources", []):
-        resource = Resource(id=item["id"], name=item.get("name", item["id"]), unit=item.get("unit", ""))
-        resources[resource.id] = resource
+        resource_id = intern_id(item["id"])
+        resources[resource_id] = Resource(id=resource_id, name=item.get("name", resource_id), unit=item.get("unit", ""))
     return resources
 
 
 def _load_machine_groups(config: Dict) -> Dict[str, MachineGroup]:
     groups = {}
     for item in config.get("machine_groups", []):
-        group = MachineGroup(id=item["id"], name=item.get("name", item["id"]))
-        groups[group.id] = group
+        group_id = intern_id(item["id"])
+        groups[group_id] = MachineGroup(id=group_id, name=item.get("name", group_id))
     return groups
 
 
@@ -29,29 +35,32 @@ def _load_machines(config: Dict, groups: Iterable[str]) -> Dict[str, Machine]:
         group_id = item.get("group_id")
         if group_id not in groups:
             raise ValueError(f"Machine '{item.get('id')}' references unknown group '{group_id}'")
-        capacity = {key: float(value) for key, value in item.get("capacity", {}).items()}
-        machine = Machine(id=item["id"], name=item.get("name", item["id"]), group_id=group_id, capacity=capacity)
-        machines[machine.id] = machine
+        machine_id = intern_id(item["id"])
+        capacity = _float_map(item.get("capacity", {}))
+        machines[machine_id] = Machine(
+            id=machine_id, name=item.get("name", machine_id), group_id=intern_id(group_id), capacity=capacity
+        )
     return machines
 
 
 def _load_recipe_steps(step_items: Iterable[Dict]) -> Iterable[RecipeStep]:
     steps = []
     for step in step_items:
-        target = step.get("target")
-        if target not in {"group", "machine", "order_machine"}:
-            raise ValueError(f"Unsupported target '{target}' in recipe step '{step.get('name')}'")
-        allocation = step.get("allocation")
+        get = step.get
+        target = get("target")
+        if target not in _STEP_TARGETS:
+            raise ValueError(f"Unsupported target '{target}' in recipe step '{get('name')}'")
+        allocation = get("allocation")
         if allocation is not None:
-            allocation = {key: float(value) for key, value in allocation.items()}
-        capacity_usage = {key: float(value) for key, value in step.get("capacity_usage", {}).items()}
-        resource_changes = {key: float(value) for key, value in step.get("resource_changes", {}).items()}
+            allocation = _float_map(allocation)
+        capacity_usage = _float_map(get("capacity_usage", {}))
+        resource_changes = _float_map(get("resource_changes", {}))
         recipe_step = RecipeStep(
-            name=step.get("name", ""),
+            name=get("name", ""),
             target=target,
-            machine_id=step.get("machine_id"),
-            group_id=step.get("group_id"),
-            required_group=step.get("required_group"),
+            machine_id=intern_id(get("machine_id")),
+            group_id=intern_id(get("group_id")),
+            required_group=intern_id(get("required_group")),
             allocation=allocation,
             capacity_usage=capacity_usage,
             resource_changes=resource_changes,
@@ -64,17 +73,17 @@ def _load_products(config: Dict) -> Dict[str, Product]:
     products: Dict[str, Product] = {}
     for item in config.get("products", []):
         steps = list(_load_recipe_steps(item.get("steps", [])))
-        product = Product(id=item["id"], name=item.get("name", item["id"]), unit=item.get("unit", ""), steps=steps)
-        products[product.id] = product
+        product_id = intern_id(item["id"])
+        products[product_id] = Product(
+            id=product_id, name=item.get("name", product_id), unit=item.get("unit", ""), steps=steps
+        )
     return products
 
 
 def load_plant(path: Path | str) -> Plant:
     """Load the full plant configuration from a JSON file."""
 
-    path = Path(path)
-    with path.open("r", encoding="utf-8") as fp:
-        config = json.load(fp)
+    config = load_json(Path(path))
     resources = _load_resources(config)
     groups = _load_machine_groups(config)
     machines = _load_machines(config, groups)
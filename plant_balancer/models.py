@@ -2,10 +2,12 @@ from __future__ import annotations
 
 from dataclasses import dataclass, field
 from datetime import date
-from typing import Dict, List, Optional
+from typing import Dict, List, NamedTuple, Optional, Tuple
 
+import numpy as np
 
-@dataclass(frozen=True)
+
+@dataclass(frozen=True, slots=True)
 class Resource:
     """Represents a material or utility tracked by the model."""
 
@@ -14,7 +16,7 @@ class Resource:
     unit: str
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class MachineGroup:
     """Logical group of machines with the same function."""
 
@@ -22,7 +24,7 @@ class MachineGroup:
     name: str
 
 
-@dataclass
+@dataclass(slots=True)
 class Machine:
     """Physical equipment with an optional daily capacity per metric."""
 
@@ -32,7 +34,7 @@ class Machine:
     capacity: Dict[str, float] = field(default_factory=dict)
 
 
-@dataclass
+@dataclass(slots=True)
 class RecipeStep:
     """One step of a production recipe."""
 
@@ -46,7 +48,7 @@ class RecipeStep:
     resource_changes: Dict[str, float] = field(default_factory=dict)
 
 
-@dataclass
+@dataclass(slots=True)
 class Product:
     """Product manufactured by the plant."""
 
@@ -56,7 +58,7 @@ class Product:
     steps: List[RecipeStep]
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class ProductionOrder:
     """Planned production quantity for a given day and machine."""
 
@@ -66,7 +68,7 @@ class ProductionOrder:
     quantity: float
 
 
-@dataclass
+@dataclass(slots=True)
 class MachineUsage:
     """Aggregated usage of a machine during one day."""
 
@@ -75,16 +77,18 @@ class MachineUsage:
     resource_balance: Dict[str, float] = field(default_factory=dict)
 
     def add_capacity(self, values: Dict[str, float]) -> None:
+        capacity_used = self.capacity_used
+        current = capacity_used.get
         for key, value in values.items():
-            if value == 0:
-                continue
-            self.capacity_used[key] = self.capacity_used.get(key, 0.0) + value
+            if value:
+                capacity_used[key] = current(key, 0.0) + value
 
     def add_resource_balance(self, values: Dict[str, float]) -> None:
+        resource_balance = self.resource_balance
+        current = resource_balance.get
         for key, value in values.items():
-            if value == 0:
-                continue
-            self.resource_balance[key] = self.resource_balance.get(key, 0.0) + value
+            if value:
+                resource_balance[key] = current(key, 0.0) + value
 
     def utilization(self, capacity_key: str) -> Optional[float]:
         capacity = self.machine.capacity.get(capacity_key)
@@ -94,7 +98,7 @@ class MachineUsage:
         return used / capacity
 
 
-@dataclass
+@dataclass(slots=True)
 class DaySummary:
     """Summary of production, resource balance and machine usage for a single day."""
 
@@ -121,13 +125,93 @@ class DaySummary:
         return alerts
 
 
-@dataclass
+class CapacityTensors(NamedTuple):
+    """Capacity usage as (day, machine, key) arrays; ``limits`` is NaN where there is no capacity."""
+
+    machines: List[Machine]
+    capacity_keys: List[str]
+    used: np.ndarray
+    limits: np.ndarray
+    recorded: np.ndarray
+
+
+class CompiledRecipe(NamedTuple):
+    """Recipe of one product flattened into per-machine tables of capacity keys and resources."""
+
+    value_fixed: np.ndarray
+    value_order: np.ndarray
+    nonzero_fixed: np.ndarray
+    nonzero_order: np.ndarray
+    presence_fixed: np.ndarray
+    presence_order: np.ndarray
+    order_machine_steps: Tuple[RecipeStep, ...]
+    signature: Tuple
+
+
+class CapacityAlerts(NamedTuple):
+    """Capacity overruns of a simulation, ordered by day, plant machine order and capacity key index."""
+
+    day_index: np.ndarray
+    machine_index: np.ndarray
+    key_index: np.ndarray
+    used: np.ndarray
+    limit: np.ndarray
+
+
+@dataclass(slots=True)
 class SimulationResult:
     """Holds the outcome of a production plan simulation."""
 
     plant: "Plant"
     days: List[DaySummary]
 
+    def capacity_tensors(self) -> CapacityTensors:
+        """Capacity usage of every day as dense (day, machine, key) arrays."""
+
+        machine_index = dict(self.plant.machine_id_to_ix)
+        machines = list(self.plant.machines.values())
+        key_index = dict(self.plant.capacity_key_index)
+        entries = []
+        for day_ix, day in enumerate(self.days):
+            for usage in day.machine_usage.values():
+                machine_ix = machine_index.get(usage.machine.id)
+                if machine_ix is None:
+                    machine_ix = machine_index[usage.machine.id] = len(machines)
+                    machines.append(usage.machine)
+                for key, used in usage.capacity_used.items():
+                    key_ix = key_index.setdefault(key, len(key_index))
+                    entries.append((day_ix, machine_ix, key_ix, used))
+
+        capacity_keys = list(key_index)
+        limits = np.full((len(machines), len(capacity_keys)), np.nan)
+        for machine_ix, machine in enumerate(machines):
+            for key, capacity in machine.capacity.items():
+                if capacity not in (None, 0) and key in key_index:
+                    limits[machine_ix, key_index[key]] = capacity
+        shape = (len(self.days), len(machines), len(capacity_keys))
+        used = np.zeros(shape)
+        recorded = np.zeros(shape, dtype=bool)
+        if entries:
+            day_ix, machine_ix, key_ix, values = zip(*entries)
+            used[day_ix, machine_ix, key_ix] = values
+            recorded[day_ix, machine_ix, key_ix] = True
+        return CapacityTensors(machines, capacity_keys, used, limits, recorded)
+
+    def all_capacity_alerts(self, tensors: Optional[CapacityTensors] = None) -> CapacityAlerts:
+        """Every (day, machine, key) whose recorded usage exceeds the declared capacity."""
+
+        if tensors is None:
+            tensors = self.capacity_tensors()
+        exceeded = tensors.recorded & (tensors.used > tensors.limits)
+        day_index, machine_index, key_index = np.nonzero(exceeded)
+        return CapacityAlerts(
+            day_index=day_index,
+            machine_index=machine_index,
+            key_index=key_index,
+            used=tensors.used[day_index, machine_index, key_index],
+            limit=tensors.limits[machine_index, key_index],
+        )
+
     def overall_resource_balance(self) -> Dict[str, float]:
         totals: Dict[str, float] = {}
         for day in self.days:
@@ -143,21 +227,59 @@ class SimulationResult:
         return totals
 
 
-@dataclass
+@dataclass(slots=True)
 class Plant:
-    """Complete representation of the plant configuration."""
+    """Complete representation of the plant configuration.
+
+    ``simulate`` rebuilds the derived indexes when machines, products or recipe keys were
+    added; call ``reindex`` after other edits, such as moving a machine to another group.
+    """
 
     resources: Dict[str, Resource]
     machine_groups: Dict[str, MachineGroup]
     machines: Dict[str, Machine]
     products: Dict[str, Product]
     machines_by_group: Dict[str, List[Machine]] = field(init=False)
+    capacity_key_index: Dict[str, int] = field(init=False)
+    sorted_product_ids: List[str] = field(init=False)
+    sorted_resource_ids: List[str] = field(init=False)
+    machine_id_to_ix: Dict[str, int] = field(init=False)
+    product_id_to_ix: Dict[str, int] = field(init=False)
+    resource_id_to_ix: Dict[str, int] = field(init=False)
+    _compiled_recipes: Dict[str, CompiledRecipe] = field(
+        default_factory=dict, init=False, repr=False, compare=False
+    )
 
     def __post_init__(self) -> None:
+        self.reindex()
+
+    def reindex(self) -> None:
+        """Rebuild the derived indexes after the plant was edited."""
+
+        # Integer ids follow the insertion order of machines/products and the sorted resources.
         mapping: Dict[str, List[Machine]] = {group_id: [] for group_id in self.machine_groups}
-        for machine in self.machines.values():
+        machine_id_to_ix: Dict[str, int] = {}
+        capacity_key_index: Dict[str, int] = {}
+        resource_ids = set(self.resources)
+        for machine_ix, (machine_id, machine) in enumerate(self.machines.items()):
             mapping.setdefault(machine.group_id, []).append(machine)
+            machine_id_to_ix[machine_id] = machine_ix
+            for key in machine.capacity:
+                capacity_key_index.setdefault(key, len(capacity_key_index))
+        for product in self.products.values():
+            for step in product.steps:
+                for key in step.capacity_usage:
+                    capacity_key_index.setdefault(key, len(capacity_key_index))
+                resource_ids.update(step.resource_changes)
         self.machines_by_group = mapping
+        self.capacity_key_index = capacity_key_index
+        self.sorted_product_ids = sorted(self.products)
+        self.sorted_resource_ids = sorted(resource_ids)
+        self.machine_id_to_ix = machine_id_to_ix
+        self.product_id_to_ix = {product_id: index for index, product_id in enumerate(self.products)}
+        self.resource_id_to_ix = {resource_id: index for index, resource_id in enumerate(self.sorted_resource_ids)}
+        # Compiled recipes are laid out on the previous indexes.
+        self._compiled_recipes.clear()
 
     def get_machine(self, machine_id: str) -> Machine:
         try:
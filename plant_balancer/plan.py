@@ -1,19 +1,25 @@
 from __future__ import annotations
 
-import json
-from dataclasses import dataclass
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass, field
 from datetime import date
+from functools import lru_cache
+from operator import attrgetter
 from pathlib import Path
 from typing import Dict, Iterable, List, Optional
 
+from ._json import intern_id, load_json
 from .models import Plant, ProductionOrder
 
+_order_date = attrgetter("date")
 
-@dataclass
+
+@dataclass(slots=True)
 class ProductionPlan:
-    """Collection of production orders."""
+    """Collection of production orders; ``sorted_by_date`` plans are filtered by bisection."""
 
     orders: List[ProductionOrder]
+    sorted_by_date: bool = field(default=False, compare=False)
 
     def orders_by_day(self) -> Dict[date, List[ProductionOrder]]:
         grouped: Dict[date, List[ProductionOrder]] = {}
@@ -22,6 +28,10 @@ class ProductionPlan:
         return grouped
 
     def filter_by_date_range(self, start: Optional[date], end: Optional[date]) -> "ProductionPlan":
+        if self.sorted_by_date:
+            low = bisect_left(self.orders, start, key=_order_date) if start else 0
+            high = bisect_right(self.orders, end, key=_order_date) if end else len(self.orders)
+            return ProductionPlan(self.orders[low:high], sorted_by_date=True)
         filtered = []
         for order in self.orders:
             if start and order.date < start:
@@ -42,6 +52,7 @@ class ProductionPlan:
             raise ValueError("\n".join(errors))
 
 
+@lru_cache(maxsize=4096)
 def _parse_date(value: str) -> date:
     try:
         return date.fromisoformat(value)
@@ -59,8 +70,8 @@ def _parse_orders(items: Iterable[Dict]) -> List[ProductionOrder]:
         orders.append(
             ProductionOrder(
                 date=order_date,
-                product_id=item["product_id"],
-                machine_id=item["machine_id"],
+                product_id=intern_id(item["product_id"]),
+                machine_id=intern_id(item["machine_id"]),
                 quantity=quantity,
             )
         )
@@ -70,9 +81,7 @@ def _parse_orders(items: Iterable[Dict]) -> List[ProductionOrder]:
 def load_plan(path: Path | str) -> ProductionPlan:
     """Load production orders from a JSON file."""
 
-    path = Path(path)
-    with path.open("r", encoding="utf-8") as fp:
-        data = json.load(fp)
+    data = load_json(Path(path))
     orders = _parse_orders(data.get("orders", []))
     orders.sort(key=lambda order: (order.date, order.product_id, order.machine_id))
-    return ProductionPlan(orders)
+    return ProductionPlan(orders, sorted_by_date=True)
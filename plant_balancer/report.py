@@ -1,130 +1,189 @@
 from __future__ import annotations
 
-from typing import Dict, Iterable, List, Tuple
+from io import StringIO
+from typing import Any, Callable, Iterable, List, Mapping, Sequence, Tuple, TypeVar
 
-from .models import MachineUsage, SimulationResult
+import numpy as np
 
+from .models import CapacityTensors, MachineUsage, Product, Resource, SimulationResult
 
-def _format_quantity(value: float, decimals: int = 2) -> str:
-    return f"{value:.{decimals}f}"
+_ValueT = TypeVar("_ValueT")
 
 
-def _format_resource(result: SimulationResult, resource_id: str, value: float, decimals: int = 2) -> str:
-    resource = result.plant.resources.get(resource_id)
+# The "%" presentation type multiplies by 100 itself ("48.1%").
+_format_ratio = "{:.1%}".format
+
+
+def _quantity_formatter(decimals: int) -> Callable[[float], str]:
+    """Bound ``str.format`` for ``decimals`` places, so the spec is built only once."""
+
+    return f"{{:.{decimals}f}}".format
+
+
+def _format_resource(
+    resources: Mapping[str, Resource], resource_id: str, value: float, fmt: Callable[[float], str]
+) -> str:
+    resource = resources.get(resource_id)
     name = resource.name if resource else resource_id
     unit = resource.unit if resource else ""
-    quantity = _format_quantity(value, decimals)
+    quantity = fmt(value)
     if unit:
         return f"{name}: {quantity} {unit}"
     return f"{name}: {quantity}"
 
 
-def _max_utilization(result: SimulationResult) -> List[Tuple[str, str, float, float, float, str]]:
-    stats: Dict[Tuple[str, str], Tuple[float, float, float, str]] = {}
-    for day in result.days:
-        for usage in day.machine_usage.values():
-            for key, used in usage.capacity_used.items():
-                capacity = usage.machine.capacity.get(key)
-                if capacity in (None, 0):
-                    continue
-                ratio = used / capacity
-                current = stats.get((usage.machine.id, key))
-                if current is None or ratio > current[0]:
-                    stats[(usage.machine.id, key)] = (ratio, used, capacity, day.date.isoformat(), usage.machine.name)
-    entries = [
-        (machine_id, cap_key, ratio, used, capacity, day, name)
-        for (machine_id, cap_key), (ratio, used, capacity, day, name) in stats.items()
-    ]
-    entries.sort(key=lambda item: item[2], reverse=True)
+def _write_products(
+    buf: StringIO, products: Mapping[str, Product], items: Iterable[Tuple[str, float]], fmt: Callable[[float], str]
+) -> None:
+    write = buf.write
+    for product_id, quantity in items:
+        product = products.get(product_id)
+        description = product.name if product else product_id
+        unit = product.unit if product else ""
+        if unit:
+            write(f"    - {description}: {fmt(quantity)} {unit}\n")
+        else:
+            write(f"    - {description}: {fmt(quantity)}\n")
+
+
+def _ordered_items(
+    values: Mapping[str, _ValueT],
+    ordered_keys: Sequence[str],
+    fallback_key: Callable[[Tuple[str, _ValueT]], Any] | None = None,
+) -> List[Tuple[str, _ValueT]]:
+    """Items of ``values`` in ``ordered_keys`` order, sorted instead when a key is missing there."""
+
+    items = [(key, values[key]) for key in ordered_keys if key in values]
+    if len(items) != len(values):
+        return sorted(values.items(), key=fallback_key)
+    return items
+
+
+def _max_utilization(
+    result: SimulationResult, tensors: CapacityTensors
+) -> List[Tuple[str, str, float, float, float, str, str]]:
+    """Peak utilization of every (machine, capacity key), highest first, ties in plant order."""
+
+    valid = tensors.recorded & ~np.isnan(tensors.limits)
+    ratio = np.full(tensors.used.shape, -np.inf)
+    np.divide(tensors.used, tensors.limits, out=ratio, where=valid)
+    has_ratio = valid.any(axis=0)
+    # argmax keeps the first day reaching the peak, like a running strict maximum.
+    peak_day = np.argmax(ratio, axis=0)
+    peak_ratio = np.take_along_axis(ratio, peak_day[np.newaxis], axis=0)[0]
+    machine_ix, key_ix = np.nonzero(has_ratio)
+    # np.nonzero walks (machine, key) in index order, which the stable sort keeps for ties.
+    order = np.argsort(-peak_ratio[machine_ix, key_ix], kind="stable")
+    entries = []
+    for m, k in zip(machine_ix[order].tolist(), key_ix[order].tolist()):
+        machine = tensors.machines[m]
+        day_ix = int(peak_day[m, k])
+        entries.append(
+            (
+                machine.id,
+                tensors.capacity_keys[k],
+                float(peak_ratio[m, k]),
+                float(tensors.used[day_ix, m, k]),
+                float(tensors.limits[m, k]),
+                result.days[day_ix].date.isoformat(),
+                machine.name,
+            )
+        )
     return entries
 
 
-def _format_machine_usage(result: SimulationResult, usage: MachineUsage, decimals: int) -> List[str]:
-    lines: List[str] = []
-    header = f"- {usage.machine.name} ({usage.machine.id})"
-    lines.append(header)
+def _write_machine_usage(
+    buf: StringIO,
+    usage: MachineUsage,
+    resources: Mapping[str, Resource],
+    capacity_keys: Sequence[str],
+    resource_ids: Sequence[str],
+    fmt: Callable[[float], str],
+) -> None:
+    write = buf.write
+    machine = usage.machine
+    write(f"  - {machine.name} ({machine.id})\n")
     if usage.capacity_used:
-        for key, value in sorted(usage.capacity_used.items()):
-            capacity = usage.machine.capacity.get(key)
+        for key, value in _ordered_items(usage.capacity_used, capacity_keys):
+            capacity = machine.capacity.get(key)
             if capacity in (None, 0):
-                lines.append(f"    {key}: {_format_quantity(value, decimals)} (sem limite definido)")
+                write(f"      {key}: {fmt(value)} (sem limite definido)\n")
             else:
-                percent = (value / capacity) * 100
-                lines.append(
-                    f"    {key}: {_format_quantity(value, decimals)} / {_format_quantity(capacity, decimals)} ({percent:.1f}%)"
-                )
+                write(f"      {key}: {fmt(value)} / {fmt(capacity)} ({_format_ratio(value / capacity)})\n")
     if usage.resource_balance:
-        lines.append("    Recursos associados:")
-        for resource_id, value in sorted(usage.resource_balance.items()):
-            lines.append(f"      {_format_resource(result, resource_id, value, decimals)}")
-    return lines
+        write("      Recursos associados:\n")
+        for resource_id, value in _ordered_items(usage.resource_balance, resource_ids):
+            write(f"        {_format_resource(resources, resource_id, value, fmt)}\n")
 
 
 def format_simulation_report(result: SimulationResult, decimals: int = 2) -> str:
     """Create a human-readable textual report for the simulation."""
 
-    lines: List[str] = []
     if not result.days:
         return "Nenhuma ordem de produção disponível."
 
-    for day in result.days:
-        lines.append(f"Dia {day.date.isoformat()}")
+    plant = result.plant
+    products = plant.products
+    resources = plant.resources
+    product_ids = plant.sorted_product_ids
+    resource_ids = plant.sorted_resource_ids
+    capacity_keys = sorted(plant.capacity_key_index)
+    machine_ids = sorted(plant.machines, key=lambda machine_id: plant.machines[machine_id].name)
+    fmt = _quantity_formatter(decimals)
+
+    tensors = result.capacity_tensors()
+    alerts = result.all_capacity_alerts(tensors)
+    alert_bounds = np.searchsorted(alerts.day_index, np.arange(len(result.days) + 1)).tolist()
+    alert_machines = tensors.machines
+    alert_keys = tensors.capacity_keys
+    alert_machine_index = alerts.machine_index.tolist()
+    alert_key_index = alerts.key_index.tolist()
+    alert_used = alerts.used.tolist()
+    alert_limit = alerts.limit.tolist()
+
+    buf = StringIO()
+    write = buf.write
+    for day_ix, day in enumerate(result.days):
+        write(f"Dia {day.date.isoformat()}\n")
         if day.product_quantities:
-            lines.append("  Produção planejada:")
-            for product_id, quantity in sorted(day.product_quantities.items()):
-                product = result.plant.products.get(product_id)
-                description = product.name if product else product_id
-                unit = product.unit if product else ""
-                formatted_quantity = _format_quantity(quantity, decimals)
-                if unit:
-                    lines.append(f"    - {description}: {formatted_quantity} {unit}")
-                else:
-                    lines.append(f"    - {description}: {formatted_quantity}")
+            write("  Produção planejada:\n")
+            _write_products(buf, products, _ordered_items(day.product_quantities, product_ids), fmt)
         if day.machine_usage:
-            lines.append("  Utilização dos equipamentos:")
-            ordered = sorted(day.machine_usage.values(), key=lambda item: item.machine.name)
-            for usage in ordered:
-                lines.extend(["  " + entry for entry in _format_machine_usage(result, usage, decimals)])
+            write("  Utilização dos equipamentos:\n")
+            ordered = _ordered_items(day.machine_usage, machine_ids, fallback_key=lambda item: item[1].machine.name)
+            for _machine_id, usage in ordered:
+                _write_machine_usage(buf, usage, resources, capacity_keys, resource_ids, fmt)
         if day.resource_balance:
-            lines.append("  Balanço de recursos do dia:")
-            for resource_id, value in sorted(day.resource_balance.items()):
-                lines.append(f"    - {_format_resource(result, resource_id, value, decimals)}")
-        alerts = day.capacity_alerts()
-        if alerts:
-            lines.append("  Alertas de capacidade:")
-            for alert in alerts:
-                used = _format_quantity(alert["used"], decimals)
-                limit = _format_quantity(alert["limit"], decimals)
-                lines.append(
-                    f"    - {alert['machine_name']} ({alert['machine_id']}) excede {alert['capacity_key']}: {used} / {limit}"
+            write("  Balanço de recursos do dia:\n")
+            for resource_id, value in _ordered_items(day.resource_balance, resource_ids):
+                write(f"    - {_format_resource(resources, resource_id, value, fmt)}\n")
+        first, last = alert_bounds[day_ix], alert_bounds[day_ix + 1]
+        if first < last:
+            write("  Alertas de capacidade:\n")
+            for alert_ix in range(first, last):
+                machine = alert_machines[alert_machine_index[alert_ix]]
+                write(
+                    f"    - {machine.name} ({machine.id}) excede {alert_keys[alert_key_index[alert_ix]]}: "
+                    f"{fmt(alert_used[alert_ix])} / {fmt(alert_limit[alert_ix])}\n"
                 )
-        lines.append("")
+        write("\n")
 
-    lines.append("Resumo consolidado do horizonte:")
+    write("Resumo consolidado do horizonte:\n")
     totals = result.overall_product_quantities()
     if totals:
-        lines.append("  Produção acumulada:")
-        for product_id, quantity in sorted(totals.items()):
-            product = result.plant.products.get(product_id)
-            description = product.name if product else product_id
-            unit = product.unit if product else ""
-            formatted_quantity = _format_quantity(quantity, decimals)
-            if unit:
-                lines.append(f"    - {description}: {formatted_quantity} {unit}")
-            else:
-                lines.append(f"    - {description}: {formatted_quantity}")
+        write("  Produção acumulada:\n")
+        _write_products(buf, products, _ordered_items(totals, product_ids), fmt)
     resource_totals = result.overall_resource_balance()
     if resource_totals:
-        lines.append("  Balanço acumulado de recursos:")
-        for resource_id, value in sorted(resource_totals.items()):
-            lines.append(f"    - {_format_resource(result, resource_id, value, decimals)}")
-    utilization = _max_utilization(result)
+        write("  Balanço acumulado de recursos:\n")
+        for resource_id, value in _ordered_items(resource_totals, resource_ids):
+            write(f"    - {_format_resource(resources, resource_id, value, fmt)}\n")
+    utilization = _max_utilization(result, tensors)
     if utilization:
-        lines.append("  Picos de utilização dos equipamentos:")
+        write("  Picos de utilização dos equipamentos:\n")
         for machine_id, capacity_key, ratio, used, capacity, day, name in utilization:
-            lines.append(
-                "    - "
-                + f"{name} ({machine_id}) - {capacity_key}: {ratio*100:.1f}% ("
-                + f"{_format_quantity(used, decimals)} de {_format_quantity(capacity, decimals)} no dia {day})"
+            write(
+                f"    - {name} ({machine_id}) - {capacity_key}: {_format_ratio(ratio)} "
+                f"({fmt(used)} de {fmt(capacity)} no dia {day})\n"
             )
-    return "\n".join(lines).strip()
+    return buf.getvalue().strip()
@@ -1,10 +1,20 @@
 from __future__ import annotations
 
-from collections import defaultdict
-from datetime import date
-from typing import Dict, Iterable, List, Tuple
+from typing import Dict, Iterable, List, Optional, Tuple
 
-from .models import DaySummary, Machine, MachineUsage, Plant, ProductionOrder, RecipeStep, SimulationResult
+import numpy as np
+
+from .models import (
+    CompiledRecipe,
+    DaySummary,
+    Machine,
+    MachineUsage,
+    Plant,
+    Product,
+    ProductionOrder,
+    RecipeStep,
+    SimulationResult,
+)
 
 
 class SimulationError(RuntimeError):
@@ -64,54 +74,266 @@ def _resolve_step_machines(step: RecipeStep, order: ProductionOrder, plant: Plan
     raise SimulationError(f"Alvo de etapa desconhecido: {step.target}")
 
 
-def _scale_values(values: Dict[str, float], factor: float) -> Dict[str, float]:
-    return {key: value * factor for key, value in values.items()}
+_ResolveCache = Dict[Tuple[int, Optional[str]], List[Tuple[Machine, float]]]
 
 
-def simulate(plant: Plant, plan: Iterable[ProductionOrder]) -> SimulationResult:
-    """Simulate how the plant behaves for the given production plan."""
+def _resolve_cached(
+    cache: _ResolveCache, step: RecipeStep, order: ProductionOrder, plant: Plant
+) -> List[Tuple[Machine, float]]:
+    """``_resolve_step_machines`` memoized per step (and order machine) within a simulation."""
 
-    orders_by_day: Dict[date, List[ProductionOrder]] = defaultdict(list)
-    for order in plan:
-        orders_by_day[order.date].append(order)
-
-    days: List[DaySummary] = []
-    for current_day in sorted(orders_by_day.keys()):
-        day_orders = orders_by_day[current_day]
-        product_totals: Dict[str, float] = defaultdict(float)
-        machine_usage: Dict[str, MachineUsage] = {}
-        resource_balance: Dict[str, float] = defaultdict(float)
-
-        for order in day_orders:
-            product = plant.get_product(order.product_id)
-            product_totals[product.id] += order.quantity
-            for step in product.steps:
-                machines = _resolve_step_machines(step, order, plant)
-                for machine, share in machines:
-                    quantity_factor = order.quantity * share
-                    usage = machine_usage.setdefault(machine.id, MachineUsage(machine=machine))
-                    capacity_add = _scale_values(step.capacity_usage, quantity_factor)
-                    usage.add_capacity(capacity_add)
-                    resource_add = _scale_values(step.resource_changes, quantity_factor)
-                    usage.add_resource_balance(resource_add)
-                    for resource_id, value in resource_add.items():
-                        resource_balance[resource_id] += value
-
-        machine_usage = {
-            machine_id: MachineUsage(
-                machine=usage.machine,
-                capacity_used=dict(usage.capacity_used),
-                resource_balance=dict(usage.resource_balance),
-            )
-            for machine_id, usage in machine_usage.items()
-        }
+    key = (id(step), order.machine_id if step.target == "order_machine" else None)
+    machines = cache.get(key)
+    if machines is None:
+        machines = cache[key] = _resolve_step_machines(step, order, plant)
+    return machines
 
-        day_summary = DaySummary(
-            date=current_day,
-            product_quantities=dict(product_totals),
-            machine_usage=machine_usage,
-            resource_balance=dict(resource_balance),
+
+_FLAG_DTYPE = np.float32
+
+
+def _accumulate(days, products, machines, quantities, fixed_coef, order_coef, out) -> None:
+    """Add ``quantity * coefficient`` of every (merged) order into ``out[day, machine, column]``."""
+
+    n_days, n_machines = out.shape[:2]
+    n_products = fixed_coef.shape[0]
+    per_product = np.zeros((n_days, n_products), dtype=out.dtype)
+    np.add.at(per_product, (days, products), quantities)
+    out += np.tensordot(per_product, fixed_coef, axes=(1, 0))
+    on_machine = machines >= 0
+    if on_machine.any():
+        per_machine = np.zeros((n_days, n_products, n_machines), dtype=out.dtype)
+        np.add.at(per_machine, (days[on_machine], products[on_machine], machines[on_machine]), quantities[on_machine])
+        out += np.einsum("dpm,pc->dmc", per_machine, order_coef)
+
+
+def _recipe_signature(product: Product) -> Tuple:
+    """Contents of ``product``'s steps that the compiled tables are built from."""
+
+    return tuple(
+        (
+            step.target,
+            step.machine_id,
+            step.group_id,
+            step.required_group,
+            tuple(step.allocation.items()) if step.allocation is not None else None,
+            tuple(step.capacity_usage.items()),
+            tuple(step.resource_changes.items()),
         )
-        days.append(day_summary)
+        for step in product.steps
+    )
+
+
+def _compiled_recipe(plant: Plant, product: Product, order: ProductionOrder) -> CompiledRecipe:
+    """Flatten ``product``'s recipe into dense tables, memoized on the plant until its steps change."""
+
+    signature = _recipe_signature(product)
+    recipe = plant._compiled_recipes.get(product.id)
+    if recipe is not None and recipe.signature == signature:
+        return recipe
+
+    capacity_index = plant.capacity_key_index
+    resource_index = plant.resource_id_to_ix
+    machine_index = plant.machine_id_to_ix
+    n_caps = len(capacity_index)
+    n_resources = len(resource_index)
+    n_columns = n_caps + n_resources
+    n_machines = len(machine_index)
+    value_fixed = np.zeros((n_machines, n_columns))
+    value_order = np.zeros(n_columns)
+    nonzero_fixed = np.zeros(value_fixed.shape, dtype=_FLAG_DTYPE)
+    nonzero_order = np.zeros(value_order.shape, dtype=_FLAG_DTYPE)
+    presence_fixed = np.zeros((n_machines, n_resources + 1), dtype=_FLAG_DTYPE)
+    presence_order = np.zeros(n_resources + 1, dtype=_FLAG_DTYPE)
+    order_machine_steps: List[RecipeStep] = []
+
+    for step in product.steps:
+        if step.target == "order_machine":
+            order_machine_steps.append(step)
+            targets = [(value_order, nonzero_order, presence_order, 1.0)]
+        else:
+            targets = [
+                (
+                    value_fixed[machine_index[machine.id]],
+                    nonzero_fixed[machine_index[machine.id]],
+                    presence_fixed[machine_index[machine.id]],
+                    share,
+                )
+                for machine, share in _resolve_step_machines(step, order, plant)
+            ]
+        for values, nonzero, presence, share in targets:
+            for key, coef in step.capacity_usage.items():
+                column = capacity_index[key]
+                values[column] += coef * share
+                if coef:
+                    nonzero[column] = 1.0
+            for resource_id, coef in step.resource_changes.items():
+                resource_ix = resource_index[resource_id]
+                values[n_caps + resource_ix] += coef * share
+                if coef:
+                    nonzero[n_caps + resource_ix] = 1.0
+                presence[resource_ix] = 1.0
+            presence[n_resources] = 1.0
+
+    recipe = CompiledRecipe(
+        value_fixed=value_fixed,
+        value_order=value_order,
+        nonzero_fixed=nonzero_fixed,
+        nonzero_order=nonzero_order,
+        presence_fixed=presence_fixed,
+        presence_order=presence_order,
+        order_machine_steps=tuple(order_machine_steps),
+        signature=signature,
+    )
+    plant._compiled_recipes[product.id] = recipe
+    return recipe
+
+
+def _indexes_cover(plant: Plant, products: Iterable[Product]) -> bool:
+    """Whether the plant's indexes cover its machines, products and the steps of ``products``."""
 
+    if plant.machine_id_to_ix.keys() != plant.machines.keys() or plant.product_id_to_ix.keys() != plant.products.keys():
+        return False
+    capacity_index = plant.capacity_key_index
+    resource_index = plant.resource_id_to_ix
+    return all(
+        key in capacity_index for product in products for step in product.steps for key in step.capacity_usage
+    ) and all(
+        resource_id in resource_index
+        for product in products
+        for step in product.steps
+        for resource_id in step.resource_changes
+    )
+
+
+def _simulate_compiled(plant: Plant, plan: Iterable[ProductionOrder]) -> SimulationResult:
+    orders = list(plan)
+    # First order of each product in the plan; only these recipes are compiled (and validated).
+    first_orders: Dict[str, ProductionOrder] = {}
+    for order in orders:
+        if order.product_id not in first_orders:
+            plant.get_product(order.product_id)
+            first_orders[order.product_id] = order
+    if not _indexes_cover(plant, (plant.products[product_id] for product_id in first_orders)):
+        plant.reindex()
+
+    dates = sorted({order.date for order in orders})
+    day_index = {current_day: index for index, current_day in enumerate(dates)}
+    machine_list = list(plant.machines.values())
+    machine_index = plant.machine_id_to_ix
+    products = list(plant.products.values())
+    product_index = plant.product_id_to_ix
+    capacity_index = plant.capacity_key_index
+    resource_index = plant.resource_id_to_ix
+
+    n_caps = len(capacity_index)
+    n_resources = len(resource_index)
+    n_columns = n_caps + n_resources
+    shape = (len(products), len(machine_list))
+
+    value_fixed = np.zeros(shape + (n_columns,))
+    value_order = np.zeros((len(products), n_columns))
+    nonzero_fixed = np.zeros(value_fixed.shape, dtype=_FLAG_DTYPE)
+    nonzero_order = np.zeros(value_order.shape, dtype=_FLAG_DTYPE)
+    presence_fixed = np.zeros(shape + (n_resources + 1,), dtype=_FLAG_DTYPE)
+    presence_order = np.zeros((len(products), n_resources + 1), dtype=_FLAG_DTYPE)
+    recipes: Dict[int, CompiledRecipe] = {}
+    for product_id, order in first_orders.items():
+        product_ix = product_index[product_id]
+        recipe = recipes[product_ix] = _compiled_recipe(plant, products[product_ix], order)
+        value_fixed[product_ix] = recipe.value_fixed
+        value_order[product_ix] = recipe.value_order
+        nonzero_fixed[product_ix] = recipe.nonzero_fixed
+        nonzero_order[product_ix] = recipe.nonzero_order
+        presence_fixed[product_ix] = recipe.presence_fixed
+        presence_order[product_ix] = recipe.presence_order
+
+    n_orders = len(orders)
+    order_days = np.empty(n_orders, dtype=np.int64)
+    order_products = np.empty(n_orders, dtype=np.int64)
+    order_machines = np.full(n_orders, -1, dtype=np.int64)
+    quantities = np.empty(n_orders, dtype=np.float64)
+    resolve_cache: _ResolveCache = {}
+    for i, order in enumerate(orders):
+        product_ix = product_index[order.product_id]
+        order_days[i] = day_index[order.date]
+        order_products[i] = product_ix
+        quantities[i] = order.quantity
+        order_machine_steps = recipes[product_ix].order_machine_steps
+        if order_machine_steps:
+            for step in order_machine_steps:
+                _resolve_cached(resolve_cache, step, order, plant)
+            order_machines[i] = machine_index[order.machine_id]
+
+    # Contributions are linear in the quantity, so orders sharing (day, product, order machine)
+    # are merged first.
+    group_keys = (order_days * len(products) + order_products) * (len(machine_list) + 1) + order_machines + 1
+    _, first, group_ix = np.unique(group_keys, return_index=True, return_inverse=True)
+    group_days = order_days[first]
+    group_products = order_products[first]
+    group_machines = order_machines[first]
+    group_quantities = np.bincount(group_ix, weights=quantities)
+    group_active = np.bincount(group_ix, weights=quantities != 0).astype(_FLAG_DTYPE)
+    group_orders = np.bincount(group_ix).astype(_FLAG_DTYPE)
+
+    totals_shape = (len(dates), len(machine_list))
+    values = np.zeros(totals_shape + (n_columns,))
+    _accumulate(group_days, group_products, group_machines, group_quantities, value_fixed, value_order, values)
+    nonzero = np.zeros(values.shape, dtype=_FLAG_DTYPE)
+    _accumulate(group_days, group_products, group_machines, group_active, nonzero_fixed, nonzero_order, nonzero)
+    presence = np.zeros(totals_shape + (n_resources + 1,), dtype=_FLAG_DTYPE)
+    _accumulate(group_days, group_products, group_machines, group_orders, presence_fixed, presence_order, presence)
+
+    product_totals = np.zeros((len(dates), len(products)))
+    np.add.at(product_totals, (group_days, group_products), group_quantities)
+    product_present = np.zeros(product_totals.shape, dtype=bool)
+    product_present[group_days, group_products] = True
+    resource_totals = values[:, :, n_caps:].sum(axis=1)
+    resource_present = presence[:, :, :n_resources].any(axis=1)
+
+    # np.nonzero walks the flagged entries in (day, machine, column) order.
+    capacity_keys = list(capacity_index)
+    resource_ids = list(resource_index)
+    product_ids = list(plant.products)
+    machine_usage: List[Dict[str, MachineUsage]] = [{} for _ in dates]
+    product_quantities: List[Dict[str, float]] = [{} for _ in dates]
+    resource_balance: List[Dict[str, float]] = [{} for _ in dates]
+
+    used_machines = presence[:, :, n_resources] > 0
+    for day_ix, machine_ix in zip(*(index.tolist() for index in np.nonzero(used_machines))):
+        machine = machine_list[machine_ix]
+        machine_usage[day_ix][machine.id] = MachineUsage(machine=machine)
+    flagged = nonzero > 0
+    for day_ix, machine_ix, column, value in zip(
+        *(index.tolist() for index in np.nonzero(flagged)), values[flagged].tolist()
+    ):
+        usage = machine_usage[day_ix][machine_list[machine_ix].id]
+        if column < n_caps:
+            usage.capacity_used[capacity_keys[column]] = value
+        else:
+            usage.resource_balance[resource_ids[column - n_caps]] = value
+    for day_ix, product_ix, quantity in zip(
+        *(index.tolist() for index in np.nonzero(product_present)), product_totals[product_present].tolist()
+    ):
+        product_quantities[day_ix][product_ids[product_ix]] = quantity
+    for day_ix, resource_ix, value in zip(
+        *(index.tolist() for index in np.nonzero(resource_present)), resource_totals[resource_present].tolist()
+    ):
+        resource_balance[day_ix][resource_ids[resource_ix]] = value
+
+    days = [
+        DaySummary(
+            date=current_day,
+            product_quantities=product_quantities[day_ix],
+            machine_usage=machine_usage[day_ix],
+            resource_balance=resource_balance[day_ix],
+        )
+        for day_ix, current_day in enumerate(dates)
+    ]
     return SimulationResult(plant=plant, days=days)
+
+
+def simulate(plant: Plant, plan: Iterable[ProductionOrder]) -> SimulationResult:
+    """Simulate how the plant behaves for the given production plan."""
+
+    return _simulate_compiled(plant, plan)
@@ -3,8 +3,9 @@ from __future__ import annotations
 from dataclasses import dataclass
 from datetime import date
 from pathlib import Path
-from typing import Dict, Iterable, List
+from typing import Dict, Iterable, List, Tuple
 
+import numpy as np
 import pandas as pd
 import streamlit as st
 
@@ -13,10 +14,10 @@ from .analytics import (
     PRODUCT_CATEGORY,
     RESOURCE_CATEGORY,
     HourlySeries,
-    build_hourly_series,
+    build_hourly_series_by_category,
 )
 from .config import load_plant
-from .models import Plant
+from .models import Plant, ProductionOrder, SimulationResult
 from .plan import ProductionPlan, load_plan
 from .simulator import SimulationError, simulate
 
@@ -33,12 +34,48 @@ CATEGORY_DESCRIPTIONS: Dict[str, str] = {
 }
 
 
-@dataclass
+_FileKey = Tuple[str, int, int]
+
+
+@dataclass(slots=True)
 class LoadedData:
     plant_path: Path
     plan_path: Path
     plant: Plant
     plan: ProductionPlan
+    cache_key: Tuple
+
+
+def _file_key(path: Path) -> _FileKey:
+    """Path, modification time and size: a file edited on disk gets a new key."""
+
+    stat = path.stat()
+    return str(path), stat.st_mtime_ns, stat.st_size
+
+
+# Arguments starting with "_" are not hashed by Streamlit; the key arguments stand for them.
+_MAX_CACHED_INPUTS = 8
+_MAX_CACHED_FRAMES = 64
+
+
+@st.cache_data(show_spinner=False, max_entries=_MAX_CACHED_INPUTS)
+def _load_plant_cached(file_key: _FileKey) -> Plant:
+    return load_plant(file_key[0])
+
+
+@st.cache_data(show_spinner=False, max_entries=_MAX_CACHED_INPUTS)
+def _load_plan_cached(file_key: _FileKey) -> ProductionPlan:
+    return load_plan(file_key[0])
+
+
+@st.cache_resource(show_spinner=False, max_entries=_MAX_CACHED_INPUTS)
+def _simulate_cached(_plant: Plant, _orders: List[ProductionOrder], inputs_key: Tuple) -> SimulationResult:
+    return simulate(_plant, _orders)
+
+
+@st.cache_resource(show_spinner=False, max_entries=_MAX_CACHED_INPUTS)
+def _series_by_category_cached(_result: SimulationResult, inputs_key: Tuple) -> Dict[str, List[HourlySeries]]:
+    return build_hourly_series_by_category(_result)
 
 
 def _parse_optional_date(value: str) -> date | None:
@@ -49,24 +86,26 @@ def _parse_optional_date(value: str) -> date | None:
 
 
 def _load_inputs(config_path: str, plan_path: str, start: str, end: str) -> LoadedData:
+    # A missing file surfaces as FileNotFoundError from the stat of the cache key, so
+    # there is no separate exists() check.
     config = Path(config_path).expanduser()
-    if not config.exists():
+    try:
+        config_key = _file_key(config)
+        plant = _load_plant_cached(config_key)
+    except FileNotFoundError:
         st.error(f"Arquivo de configuração não encontrado: {config}")
         st.stop()
-
-    plan_file = Path(plan_path).expanduser()
-    if not plan_file.exists():
-        st.error(f"Arquivo de plano de produção não encontrado: {plan_file}")
-        st.stop()
-
-    try:
-        plant = load_plant(config)
     except Exception as exc:
         st.error(f"Erro ao carregar configuração da fábrica: {exc}")
         st.stop()
 
+    plan_file = Path(plan_path).expanduser()
     try:
-        plan = load_plan(plan_file)
+        plan_key = _file_key(plan_file)
+        plan = _load_plan_cached(plan_key)
+    except FileNotFoundError:
+        st.error(f"Arquivo de plano de produção não encontrado: {plan_file}")
+        st.stop()
     except Exception as exc:
         st.error(f"Erro ao carregar o plano de produção: {exc}")
         st.stop()
@@ -101,19 +140,33 @@ def _load_inputs(config_path: str, plan_path: str, start: str, end: str) -> Load
         st.error(f"Plano inválido: {exc}")
         st.stop()
 
-    return LoadedData(plant_path=config, plan_path=plan_file, plant=plant, plan=plan)
+    cache_key = (config_key, plan_key, start_date, end_date)
+    return LoadedData(plant_path=config, plan_path=plan_file, plant=plant, plan=plan, cache_key=cache_key)
 
 
 def _series_to_dataframe(series_list: Iterable[HourlySeries]) -> pd.DataFrame:
-    data: Dict = {}
-    for series in series_list:
-        for point in series.points:
-            data.setdefault(point.timestamp, {})[series.label] = point.value
-    if not data:
+    series_list = list(series_list)
+    if not series_list:
         return pd.DataFrame()
-    frame = pd.DataFrame.from_dict(data, orient="index").sort_index()
-    frame.index.name = "timestamp"
-    return frame.fillna(0.0)
+    # Series built together share the same timestamps array; only merge grids that differ.
+    timestamps = series_list[0].timestamps
+    for series in series_list[1:]:
+        if series.timestamps is not timestamps and not np.array_equal(series.timestamps, timestamps):
+            timestamps = np.union1d(timestamps, series.timestamps)
+    if not len(timestamps):
+        return pd.DataFrame()
+    data = np.zeros((len(timestamps), len(series_list)))
+    for column, series in enumerate(series_list):
+        data[np.searchsorted(timestamps, series.timestamps), column] = series.values
+    index = pd.DatetimeIndex(timestamps.astype("datetime64[ns]"), name="timestamp")
+    return pd.DataFrame(data, index=index, columns=[series.label for series in series_list])
+
+
+@st.cache_data(show_spinner=False, max_entries=_MAX_CACHED_FRAMES)
+def _dataframe_cached(
+    _chosen: List[HourlySeries], inputs_key: Tuple, category: str, selected_ids: Tuple[str, ...]
+) -> pd.DataFrame:
+    return _series_to_dataframe(_chosen)
 
 
 def _format_selection_label(series: HourlySeries) -> str:
@@ -122,13 +175,6 @@ def _format_selection_label(series: HourlySeries) -> str:
     return series.label
 
 
-def _build_tabs(series: List[HourlySeries]) -> Dict[str, List[HourlySeries]]:
-    grouped: Dict[str, List[HourlySeries]] = {}
-    for item in series:
-        grouped.setdefault(item.category, []).append(item)
-    return grouped
-
-
 def main() -> None:
     st.set_page_config(page_title="Balanço de Fábrica", layout="wide")
     st.title("Balanço de Fábrica - Visualização Horária")
@@ -149,26 +195,26 @@ def main() -> None:
 
     plant = inputs.plant
     try:
-        result = simulate(plant, inputs.plan.orders)
+        result = _simulate_cached(plant, inputs.plan.orders, inputs.cache_key)
     except SimulationError as exc:
         st.error(f"Não foi possível executar a simulação: {exc}")
         st.stop()
 
-    series = build_hourly_series(result)
-    if not series:
+    grouped = _series_by_category_cached(result, inputs.cache_key)
+    if not grouped:
         st.warning("Nenhuma série disponível para exibição.")
         st.stop()
 
     plan_orders = inputs.plan.orders
-    period_start = min(order.date for order in plan_orders)
-    period_end = max(order.date for order in plan_orders)
+    # The simulated days are sorted by date.
+    period_start = result.days[0].date
+    period_end = result.days[-1].date
     st.markdown(
         f"**Período simulado:** {period_start.isoformat()} até {period_end.isoformat()} "
         f"({len(result.days)} dia{'s' if len(result.days) != 1 else ''})"
     )
     st.markdown(f"**Total de ordens analisadas:** {len(plan_orders)}")
 
-    grouped = _build_tabs(series)
     categories = [category for category in CATEGORY_LABELS if category in grouped]
     if not categories:
         st.warning("Não há dados para as categorias definidas.")
@@ -178,7 +224,7 @@ def main() -> None:
 
     for tab, category in zip(tabs, categories, strict=False):
         with tab:
-            subset = sorted(grouped[category], key=lambda item: item.label)
+            subset = grouped[category]
             description = CATEGORY_DESCRIPTIONS.get(category)
             if description:
                 st.caption(description)
@@ -194,7 +240,7 @@ def main() -> None:
                 continue
 
             chosen = [item for item in subset if item.id in selected_ids]
-            data_frame = _series_to_dataframe(chosen)
+            data_frame = _dataframe_cached(chosen, inputs.cache_key, category, tuple(selected_ids))
             if data_frame.empty:
                 st.info("Não há dados para os itens selecionados.")
                 continue
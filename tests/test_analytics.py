@@ -1,5 +1,6 @@
-from datetime import date
+from datetime import date, datetime
 
+import numpy as np
 import pytest
 
 import sys
@@ -15,6 +16,7 @@ from plant_balancer.analytics import (
     PRODUCT_CATEGORY,
     RESOURCE_CATEGORY,
     build_hourly_series,
+    build_hourly_series_by_category,
     hourly_machine_capacity_series,
     hourly_product_series,
     hourly_resource_series,
@@ -114,8 +116,29 @@ def test_hourly_machine_capacity_series_identifies_machine_and_metric():
     assert sum(point.value for point in capacity.points[24:]) == pytest.approx(60.0)
 
 
+def test_hourly_series_exposes_parallel_arrays():
+    result = _make_sample_result()
+    steam = next(item for item in hourly_resource_series(result) if item.id == "steam")
+
+    assert steam.timestamps.dtype == np.dtype("datetime64[h]")
+    assert steam.values.dtype == np.float64
+    assert steam.timestamps.shape == steam.values.shape == (48,)
+    assert steam.points[25].timestamp == datetime(2024, 1, 2, 1)
+    assert steam.values[:24].sum() == pytest.approx(-30.0)
+    assert steam.total() == pytest.approx(-48.0)
+
+
 def test_build_hourly_series_combines_all_categories():
     result = _make_sample_result()
     series = build_hourly_series(result)
     categories = {item.category for item in series}
     assert categories == {RESOURCE_CATEGORY, PRODUCT_CATEGORY, MACHINE_CAPACITY_CATEGORY}
+
+
+def test_build_hourly_series_by_category_sorts_by_label():
+    result = _make_sample_result()
+    grouped = build_hourly_series_by_category(result)
+
+    assert list(grouped) == [RESOURCE_CATEGORY, PRODUCT_CATEGORY, MACHINE_CAPACITY_CATEGORY]
+    assert [item.label for item in grouped[RESOURCE_CATEGORY]] == ["Fibra", "Vapor"]
+    assert all(item.category == category for category, items in grouped.items() for item in items)
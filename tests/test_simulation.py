@@ -1,6 +1,10 @@
 from __future__ import annotations
 
+import json
 import sys
+from collections import defaultdict
+from dataclasses import replace
+from datetime import date
 from pathlib import Path
 
 import pytest
@@ -11,8 +15,55 @@ if str(PROJECT_ROOT) not in sys.path:
     sys.path.insert(0, str(PROJECT_ROOT))
 
 from plant_balancer.config import load_plant
-from plant_balancer.plan import load_plan
-from plant_balancer.simulator import simulate
+from plant_balancer.models import (
+    DaySummary,
+    Machine,
+    MachineGroup,
+    MachineUsage,
+    Plant,
+    Product,
+    ProductionOrder,
+    RecipeStep,
+    SimulationResult,
+)
+from plant_balancer.plan import ProductionPlan, load_plan
+from plant_balancer.report import format_simulation_report
+from plant_balancer.simulator import _resolve_step_machines, simulate
+
+
+def _reference_simulate(plant: Plant, orders: list[ProductionOrder]) -> SimulationResult:
+    """Plain per-order loop the array-based ``simulate`` is checked against."""
+
+    orders_by_day = defaultdict(list)
+    for order in orders:
+        orders_by_day[order.date].append(order)
+
+    days = []
+    for current_day in sorted(orders_by_day):
+        product_totals = defaultdict(float)
+        machine_usage = {}
+        resource_balance = defaultdict(float)
+        for order in orders_by_day[current_day]:
+            product = plant.get_product(order.product_id)
+            product_totals[product.id] += order.quantity
+            for step in product.steps:
+                for machine, share in _resolve_step_machines(step, order, plant):
+                    factor = order.quantity * share
+                    usage = machine_usage.setdefault(machine.id, MachineUsage(machine=machine))
+                    usage.add_capacity({key: value * factor for key, value in step.capacity_usage.items()})
+                    resource_add = {key: value * factor for key, value in step.resource_changes.items()}
+                    usage.add_resource_balance(resource_add)
+                    for resource_id, value in resource_add.items():
+                        resource_balance[resource_id] += value
+        days.append(
+            DaySummary(
+                date=current_day,
+                product_quantities=dict(product_totals),
+                machine_usage=machine_usage,
+                resource_balance=dict(resource_balance),
+            )
+        )
+    return SimulationResult(plant=plant, days=days)
 
 
 @pytest.fixture(scope="module")
@@ -66,3 +117,202 @@ def test_overall_balances(simulation_result):
     assert product_totals["celulose_mercado"] == pytest.approx(2800.0)
     assert product_totals["papel_revestido"] == pytest.approx(2240.0)
     assert product_totals["papel_nao_revestido"] == pytest.approx(1960.0)
+
+
+def test_simulate_matches_reference_loop():
+    plant = load_plant("data/plant_config.json")
+    plan = load_plan("data/production_plan_7d.json")
+    expected = _reference_simulate(plant, plan.orders)
+    compiled = simulate(plant, plan.orders)
+
+    assert [day.date for day in compiled.days] == [day.date for day in expected.days]
+    for day, reference in zip(compiled.days, expected.days):
+        assert day.product_quantities == pytest.approx(reference.product_quantities)
+        assert day.resource_balance == pytest.approx(reference.resource_balance)
+        assert day.machine_usage.keys() == reference.machine_usage.keys()
+        for machine_id, usage in day.machine_usage.items():
+            expected_usage = reference.machine_usage[machine_id]
+            assert usage.capacity_used == pytest.approx(expected_usage.capacity_used)
+            assert usage.resource_balance == pytest.approx(expected_usage.resource_balance)
+
+
+def test_capacity_tensors_match_machine_usage(simulation_result):
+    tensors = simulation_result.capacity_tensors()
+    machine_ix = [machine.id for machine in tensors.machines].index("dig1")
+    key_ix = tensors.capacity_keys.index("chip_throughput")
+
+    assert tensors.used.shape == (7, len(tensors.machines), len(tensors.capacity_keys))
+    assert tensors.used[0, machine_ix, key_ix] == pytest.approx(250.0)
+    assert tensors.limits[machine_ix, key_ix] == pytest.approx(520.0)
+    assert tensors.recorded[:, machine_ix, key_ix].all()
+
+
+def test_filter_by_date_range_keeps_window():
+    plan = load_plan("data/production_plan_7d.json")
+    filtered = plan.filter_by_date_range(date(2023, 9, 19), date(2023, 9, 20))
+    assert filtered.orders
+    assert {order.date for order in filtered.orders} == {date(2023, 9, 19), date(2023, 9, 20)}
+    assert filtered.orders == [order for order in plan.orders if date(2023, 9, 19) <= order.date <= date(2023, 9, 20)]
+
+    unsorted = ProductionPlan(list(reversed(plan.orders)))
+    assert len(unsorted.filter_by_date_range(None, date(2023, 9, 18)).orders) == len(
+        plan.filter_by_date_range(None, date(2023, 9, 18)).orders
+    )
+
+    # Edits that keep the orders sorted are reflected by later filters.
+    first_day = len(plan.filter_by_date_range(None, date(2023, 9, 18)).orders)
+    del plan.orders[0]
+    assert len(plan.filter_by_date_range(None, date(2023, 9, 18)).orders) == first_day - 1
+
+
+def test_all_capacity_alerts_match_daily_alerts():
+    plant = load_plant("data/plant_config.json")
+    plan = load_plan("data/production_plan_7d.json")
+    orders = [replace(order, quantity=order.quantity * 1.7) for order in plan.orders]
+    result = simulate(plant, orders)
+
+    alerts = result.all_capacity_alerts()
+    tensors = result.capacity_tensors()
+    batched = sorted(
+        (
+            int(day_ix),
+            tensors.machines[machine_ix].id,
+            tensors.capacity_keys[key_ix],
+            pytest.approx(used),
+            pytest.approx(limit),
+        )
+        for day_ix, machine_ix, key_ix, used, limit in zip(*alerts)
+    )
+    expected = sorted(
+        (day_ix, alert["machine_id"], alert["capacity_key"], alert["used"], alert["limit"])
+        for day_ix, day in enumerate(result.days)
+        for alert in day.capacity_alerts()
+    )
+    assert expected
+    assert batched == expected
+
+
+def _overloaded_result() -> SimulationResult:
+    """Two machines over capacity, recorded in the reverse of the plant's order."""
+
+    first = Machine(id="m1", name="Máquina 1", group_id="g", capacity={"a": 10.0, "b": 10.0})
+    second = Machine(id="m2", name="Máquina 2", group_id="g", capacity={"a": 10.0, "b": 10.0})
+    plant = Plant(
+        resources={},
+        machine_groups={"g": MachineGroup(id="g", name="Grupo")},
+        machines={"m1": first, "m2": second},
+        products={},
+    )
+    day = DaySummary(
+        date=date(2024, 1, 1),
+        product_quantities={},
+        machine_usage={
+            "m2": MachineUsage(machine=second, capacity_used={"b": 12.0, "a": 15.0}),
+            "m1": MachineUsage(machine=first, capacity_used={"b": 20.0, "a": 12.0}),
+        },
+        resource_balance={},
+    )
+    return SimulationResult(plant=plant, days=[day])
+
+
+def _report_section(report: str, title: str) -> list[str]:
+    lines = report.splitlines()
+    start = lines.index(title) + 1
+    section = []
+    for line in lines[start:]:
+        if not line.startswith("    - "):
+            break
+        section.append(line.strip())
+    return section
+
+
+def test_utilization_peak_ties_follow_plant_order():
+    report = format_simulation_report(_overloaded_result())
+
+    assert _report_section(report, "  Picos de utilização dos equipamentos:") == [
+        "- Máquina 1 (m1) - b: 200.0% (20.00 de 10.00 no dia 2024-01-01)",
+        "- Máquina 2 (m2) - a: 150.0% (15.00 de 10.00 no dia 2024-01-01)",
+        "- Máquina 1 (m1) - a: 120.0% (12.00 de 10.00 no dia 2024-01-01)",
+        "- Máquina 2 (m2) - b: 120.0% (12.00 de 10.00 no dia 2024-01-01)",
+    ]
+
+
+def test_capacity_alerts_follow_plant_order():
+    report = format_simulation_report(_overloaded_result())
+
+    assert _report_section(report, "  Alertas de capacidade:") == [
+        "- Máquina 1 (m1) excede a: 12.00 / 10.00",
+        "- Máquina 1 (m1) excede b: 20.00 / 10.00",
+        "- Máquina 2 (m2) excede a: 15.00 / 10.00",
+        "- Máquina 2 (m2) excede b: 12.00 / 10.00",
+    ]
+
+
+def test_report_reflects_days_edited_after_a_report():
+    result = _overloaded_result()
+    format_simulation_report(result)
+    result.days[0].machine_usage["m1"].capacity_used["b"] = 30.0
+
+    report = format_simulation_report(result)
+    assert _report_section(report, "  Picos de utilização dos equipamentos:")[0] == (
+        "- Máquina 1 (m1) - b: 300.0% (30.00 de 10.00 no dia 2024-01-01)"
+    )
+
+
+def test_load_plan_accepts_numeric_ids(tmp_path):
+    path = tmp_path / "plan.json"
+    path.write_text(json.dumps({"orders": [{"date": "2024-01-01", "product_id": 7, "machine_id": 3, "quantity": 1}]}))
+
+    order = load_plan(path).orders[0]
+    assert (order.product_id, order.machine_id) == (7, 3)
+
+
+def test_editing_a_recipe_after_simulating_recompiles_it():
+    plant = load_plant("data/plant_config.json")
+    plan = load_plan("data/production_plan_7d.json")
+    before = simulate(plant, plan.orders)
+
+    for product in plant.products.values():
+        for step in product.steps:
+            for key in step.capacity_usage:
+                step.capacity_usage[key] *= 2
+    after = simulate(plant, plan.orders)
+
+    for day, reference in zip(after.days, before.days):
+        for machine_id, usage in day.machine_usage.items():
+            expected = {key: value * 2 for key, value in reference.machine_usage[machine_id].capacity_used.items()}
+            assert usage.capacity_used == pytest.approx(expected)
+
+
+def test_plant_edits_after_simulating_are_picked_up():
+    plant = load_plant("data/plant_config.json")
+    plan = load_plan("data/production_plan_7d.json")
+    simulate(plant, plan.orders)
+
+    step = plant.products["celulose_mercado"].steps[1]
+    step.capacity_usage["inspecao"] = 0.5
+    step.resource_changes["agua"] = 3.0
+    plant.products["amostra"] = Product(
+        id="amostra",
+        name="Amostra",
+        unit="t",
+        steps=[RecipeStep(name="Teste", target="machine", machine_id="btcmp", capacity_usage={"inspecao": 1.0})],
+    )
+    sample = ProductionOrder(date=plan.orders[0].date, product_id="amostra", machine_id="btcmp", quantity=4.0)
+    orders = plan.orders + [sample]
+    result = simulate(plant, orders)
+    expected = _reference_simulate(plant, orders)
+
+    first_day = plan.orders[0].date
+    pulp = sum(
+        order.quantity
+        for order in plan.orders
+        if order.date == first_day and order.product_id == "celulose_mercado"
+    )
+    usage = result.days[0].machine_usage["btcmp"]
+    assert usage.capacity_used["inspecao"] == pytest.approx(0.5 * pulp + 4.0)
+    assert result.days[0].product_quantities["amostra"] == pytest.approx(4.0)
+    for day, reference in zip(result.days, expected.days):
+        assert day.resource_balance == pytest.approx(reference.resource_balance)
+        for machine_id, usage in day.machine_usage.items():
+            assert usage.capacity_used == pytest.approx(reference.machine_usage[machine_id].capacity_used)